@@ -0,0 +1,166 @@
+from pathlib import Path
+from dataclasses import dataclass
+from hashlib import sha256
+from math import sqrt
+from typing import Callable, Optional, Sequence
+import logging
+import os
+
+from pyxems.csx import Axes, CylindricalAxes
+from pyxems.main import PyXEMSConfig, write_openEMS_xml
+from pyxems.run import simulate
+
+Probe = tuple[list[float], list[float]]
+COMPLETED = "pyxems_completed"
+
+
+@dataclass(frozen=True)
+class ConvergenceLevel:
+    factors: int | dict[Axes | CylindricalAxes, int]
+    run_dir: Path
+    probes: dict[str, Probe]
+    error: Optional[float] = None
+
+
+def read_probe(filename: Path | str) -> Probe:
+    """
+    Read a probe file written by openEMS, skipping the comment lines.
+
+    Args:
+        filename: path to the probe file.
+    Returns:
+        Probe: the time and value columns of the probe.
+    """
+    time, value = [], []
+    with open(filename) as f:
+        for line in f:
+            if line.startswith("%") or not line.strip():
+                continue
+            columns = line.split()
+            time.append(float(columns[0]))
+            value.append(float(columns[1]))
+    return time, value
+
+
+def _interpolate(probe: Probe, t: float) -> float:
+    time, value = probe
+    if t <= time[0]:
+        return value[0]
+    if t >= time[-1]:
+        return value[-1]
+    low, high = 0, len(time) - 1
+    while high - low > 1:
+        mid = (low + high) // 2
+        if time[mid] <= t:
+            low = mid
+        else:
+            high = mid
+    ratio = (t - time[low]) / (time[high] - time[low])
+    return value[low] + ratio * (value[high] - value[low])
+
+
+def probe_difference(reference: dict[str, Probe], other: dict[str, Probe]) -> float:
+    """
+    Compute the relative difference between two sets of probes.
+
+    The probes of `other` are interpolated on the time steps of `reference`, as the
+    time step of openEMS changes with the mesh.
+
+    Args:
+        reference: probes of the reference run, by name.
+        other: probes of the compared run, by name.
+    Returns:
+        float: the largest relative L2 difference over all the probes.
+    """
+    if not reference:
+        raise ValueError("No probe to compare.")
+    error = 0.0
+    for name, probe in reference.items():
+        norm, diff = 0.0, 0.0
+        for t, v in zip(*probe):
+            norm += v**2
+            diff += (v - _interpolate(other[name], t)) ** 2
+        error = max(error, sqrt(diff / norm) if norm > 0 else sqrt(diff))
+    return error
+
+
+def run_level(config: PyXEMSConfig, root: Path) -> tuple[Path, dict[str, Probe]]:
+    """
+    Simulate a configuration, reusing the results of a previous identical run.
+
+    Runs are stored in a folder named after the hash of the XML configuration.
+    A completion marker is written once openEMS succeeds, so interrupted or failed
+    runs are done again.
+
+    Args:
+        config: configuration to simulate.
+        root: folder where the runs are stored.
+    Returns:
+        tuple[Path, dict[str, Probe]]: the run folder and the probes, by name.
+    """
+    digest = sha256()
+    for chunk in config.iter_xml():
+        digest.update(chunk.encode())
+    run_dir = root.resolve() / digest.hexdigest()[:16]
+    config_path = run_dir / "openEMS_config.xml"
+    marker = run_dir / COMPLETED
+    names = [p.name for p in config.csx.properties if p.kind == "ProbeBox"]
+    if not names:
+        raise ValueError("The configuration has no ProbeBox to compare.")
+    if marker.is_file():
+        logging.info(f"Reusing the simulation results of {run_dir}")
+    else:
+        run_dir.mkdir(parents=True, exist_ok=True)
+        write_openEMS_xml(config_path, config)
+        # simulate changes the working directory to the run folder
+        cwd = Path.cwd()
+        try:
+            proc = simulate(config_path, run_dir)
+        finally:
+            os.chdir(cwd)
+        if proc.returncode != 0:
+            raise RuntimeError(f"openEMS failed in {run_dir}:\n{proc.stderr}")
+        marker.touch()
+    return run_dir, {n: read_probe(run_dir / n) for n in names}
+
+
+def mesh_convergence(
+    factory: Callable[[], PyXEMSConfig],
+    root: Path,
+    tolerance: float = 0.01,
+    levels: Sequence[int | dict[Axes | CylindricalAxes, int]] = (1, 2, 4),
+) -> list[ConvergenceLevel]:
+    """
+    Run a mesh convergence study, from the coarsest mesh to the finest one.
+
+    Each level is a fresh configuration from `factory` whose mesh lines are refined
+    by the level factors. The study stops as soon as the probes of two successive
+    levels differ by less than `tolerance`: the coarser of them is then accurate
+    enough.
+
+    Args:
+        factory: function building the configuration with the coarse mesh.
+        root: folder where the runs are stored.
+        tolerance: relative difference between two levels to reach.
+        levels: integer density factors of each level, common to all axes or given
+            by axe.
+    Returns:
+        list[ConvergenceLevel]: the simulated levels, with their difference to the
+            previous level.
+    """
+    root = root.resolve()
+    results: list[ConvergenceLevel] = []
+    for factors in levels:
+        config = factory()
+        config.csx.refine_mesh(factors)
+        run_dir, probes = run_level(config, root)
+        error = probe_difference(probes, results[-1].probes) if results else None
+        results.append(ConvergenceLevel(factors, run_dir, probes, error))
+        logging.info(f"Mesh level {factors}: relative difference {error}")
+        if error is not None and error < tolerance:
+            break
+    else:
+        logging.warning(
+            f"Mesh convergence not reached: the tolerance {tolerance} was not met after {len(results)} levels."
+        )
+    return results
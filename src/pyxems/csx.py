@@ -1,7 +1,14 @@
-from dataclasses import dataclass, field
-from typing import Literal, get_args, Protocol, Optional
+from dataclasses import dataclass, field, replace
+from math import ceil
+from typing import Iterator, Literal, get_args, Protocol, Optional, Sequence
 
 Axes = Literal["X", "Y", "Z"]
+CylindricalAxes = Literal["R", "A", "Z"]
+point = tuple[float, float, float]
+
+# openEMS stores the r, alpha and z mesh lines of cylindrical grids as X, Y and Z lines.
+CYLINDRICAL_AXES: dict[CylindricalAxes, Axes] = {"R": "X", "A": "Y", "Z": "Z"}
+CoordinatesSystem = Literal[0, 1]
 
 
 @dataclass(frozen=True)
@@ -15,6 +22,25 @@ class Line:
         xml += f"</{self.axe.upper()}Lines>"
         return xml
 
+    def refine(self, factor: int) -> "Line":
+        """
+        Scale the line density by subdividing each interval between two mesh lines.
+
+        Args:
+            factor: density scaling, each interval is split in `factor` cells.
+        Returns:
+            Line: a new line with the refined positions.
+        """
+        if not isinstance(factor, int) or factor < 1:
+            raise ValueError(f"Refinement factor must be a positive integer: {factor}")
+        position = sorted(set(self.position))
+        refined = position[:1]
+        for start, stop in zip(position[:-1], position[1:]):
+            step = (stop - start) / factor
+            refined += [start + step * n for n in range(1, factor)]
+            refined.append(stop)
+        return Line(self.axe, refined)
+
 
 @dataclass()
 class Physical:
@@ -104,9 +130,97 @@ class DumpBoxProperty:
     dumpmode: int = 1
     filetype: int = 1
     multigridlevel: int = 0
+    subsampling: Optional[tuple[int, int, int]] = None
+    optresolution: Optional[tuple[float, float, float]] = None
+    frequency: tuple[float, ...] = ()
+
+    def __post_init__(self):
+        if self.is_frequency_domain() and not self.frequency:
+            raise ValueError(
+                f"DumpType {self.dumptype} is a frequency-domain dump and requires frequency samples."
+            )
 
     def to_xml(self, short=True) -> str:
-        return f' Number="{self.number}" Type="{self.type}" Weight="{self.weight}" NormDir="{self.normdir}" StartTime="{self.starttime:g}" StopTime="{self.stoptime:g}" DumpType="{self.dumptype}" DumpMode="{self.dumpmode}" FileType="{self.filetype}" MultiGridLevel="{self.multigridlevel}"'
+        xml = f' Number="{self.number}" Type="{self.type}" Weight="{self.weight}" NormDir="{self.normdir}" StartTime="{self.starttime:g}" StopTime="{self.stoptime:g}" DumpType="{self.dumptype}" DumpMode="{self.dumpmode}" FileType="{self.filetype}" MultiGridLevel="{self.multigridlevel}"'
+        if self.subsampling is not None:
+            xml += f' SubSampling="{",".join([f"{v}" for v in self.subsampling])}"'
+        if self.optresolution is not None:
+            xml += (
+                f' OptResolution="{",".join([f"{v:g}" for v in self.optresolution])}"'
+            )
+        return xml
+
+    def is_frequency_domain(self) -> bool:
+        """
+        Frequency-domain dumps use the DumpType 10 to 13 (E, H, J and rot(H) fields)
+        and the SAR DumpType 20 and above, and require frequency samples.
+        """
+        return self.dumptype >= 10
+
+    def is_sar(self) -> bool:
+        """
+        SAR dumps use the DumpType 20 and above, and hold scalar values.
+        """
+        return self.dumptype >= 20
+
+    def nb_points(self, lines: dict[Axes, Line], start: point, stop: point) -> int:
+        """
+        Estimate the number of points written for a dump box, taking the decimation
+        options and the cell interpolation (DumpMode 2) into account.
+
+        Args:
+            lines: mesh lines of the structure, by axe.
+            start: first corner of the dump box.
+            stop: second corner of the dump box.
+        Returns:
+            int: number of points of the dumped grid.
+        """
+        total = 1
+        for n, axe in enumerate(get_args(Axes)):
+            low, high = min(start[n], stop[n]), max(start[n], stop[n])
+            inside = [p for p in lines[axe].position if low <= p <= high]
+            count = max(len(inside), 1)
+            if self.dumpmode == 2:
+                count = max(count - 1, 1)
+            if self.optresolution is not None and self.optresolution[n] > 0:
+                count = min(count, ceil((high - low) / self.optresolution[n]) + 1)
+            elif self.subsampling is not None and self.subsampling[n] > 1:
+                count = ceil(count / self.subsampling[n])
+            total *= count
+        return total
+
+    def dump_size(
+        self, lines: dict[Axes, Line], start: point, stop: point, nb_dumps: int = 1
+    ) -> tuple[int, int]:
+        """
+        Predict the size of the field dump of a box.
+
+        The prediction assumes HDF5 files (FileType 1), where each point holds a 3
+        components vector of single precision floats. Frequency-domain dumps are
+        written once per frequency with complex values, whereas time-domain dumps are
+        written `nb_dumps` times. SAR dumps hold a real scalar per point and are
+        written once per frequency.
+
+        Args:
+            lines: mesh lines of the structure, by axe.
+            start: first corner of the dump box.
+            stop: second corner of the dump box.
+            nb_dumps: number of time-domain dumps expected during the simulation.
+        Returns:
+            tuple[int, int]: bytes written per dump and in total.
+        """
+        if self.filetype != 1:
+            raise ValueError(
+                f"Dump size can only be predicted for HDF5 files, not FileType {self.filetype}."
+            )
+        if self.is_sar():
+            per_dump = self.nb_points(lines, start, stop) * 4
+            return per_dump, per_dump * len(self.frequency)
+        per_dump = self.nb_points(lines, start, stop) * 3 * 4
+        if self.is_frequency_domain():
+            per_dump *= 2
+            return per_dump, per_dump * len(self.frequency)
+        return per_dump, per_dump * nb_dumps
 
 
 @dataclass(frozen=True)
@@ -120,11 +234,38 @@ class Color:
         return f'R="{self.r}" G="{self.g}" B="{self.b}" a="{self.a}"'
 
 
+@dataclass(frozen=True)
+class Transform:
+    """
+    Placement of a cell: the cell is mirrored about its origin, then translated.
+    """
+
+    translation: point = (0.0, 0.0, 0.0)
+    mirror: tuple[bool, bool, bool] = (False, False, False)
+
+    def apply_coord(self, value: float, n: int) -> float:
+        return (-value if self.mirror[n] else value) + self.translation[n]
+
+    def apply(self, p: point) -> point:
+        return (
+            self.apply_coord(p[0], 0),
+            self.apply_coord(p[1], 1),
+            self.apply_coord(p[2], 2),
+        )
+
+
 class Primitive(Protocol):
     def to_xml(self) -> str: ...
 
+    def transform(self, transform: Transform) -> "Primitive": ...
+
+    def edges(self, n: int) -> tuple[float, ...]: ...
 
-point = tuple[float, float, float]
+
+def _coords_xml(coordinates_system: Optional[CoordinatesSystem]) -> str:
+    if coordinates_system is None:
+        return ""
+    return f' CoordSystem="{coordinates_system}"'
 
 
 @dataclass(frozen=True)
@@ -132,14 +273,106 @@ class Box(Primitive):
     start: point
     stop: point
     priority: int = 0
+    coordinates_system: Optional[CoordinatesSystem] = None
 
     def to_xml(self) -> str:
-        xml = f'<Box Priority="{self.priority}">\n'
+        xml = (
+            f'<Box Priority="{self.priority}"{_coords_xml(self.coordinates_system)}>\n'
+        )
         xml += f'    <P1 X="{self.start[0]:8e}" Y="{self.start[1]:8e}" Z="{self.start[2]:8e}" />\n'
         xml += f'    <P2 X="{self.stop[0]:8e}" Y="{self.stop[1]:8e}" Z="{self.stop[2]:8e}" />\n'
         xml += "</Box>"
         return xml
 
+    def transform(self, transform: Transform) -> "Box":
+        return replace(
+            self, start=transform.apply(self.start), stop=transform.apply(self.stop)
+        )
+
+    def edges(self, n: int) -> tuple[float, ...]:
+        return self.start[n], self.stop[n]
+
+
+@dataclass(frozen=True)
+class Cylinder(Primitive):
+    start: point
+    stop: point
+    radius: float
+    priority: int = 0
+    coordinates_system: Optional[CoordinatesSystem] = None
+
+    def to_xml(self) -> str:
+        xml = f'<Cylinder Priority="{self.priority}"{_coords_xml(self.coordinates_system)} Radius="{self.radius:e}">\n'
+        xml += f'    <P1 X="{self.start[0]:8e}" Y="{self.start[1]:8e}" Z="{self.start[2]:8e}" />\n'
+        xml += f'    <P2 X="{self.stop[0]:8e}" Y="{self.stop[1]:8e}" Z="{self.stop[2]:8e}" />\n'
+        xml += "</Cylinder>"
+        return xml
+
+    def transform(self, transform: Transform) -> "Cylinder":
+        return replace(
+            self, start=transform.apply(self.start), stop=transform.apply(self.stop)
+        )
+
+    def edges(self, n: int) -> tuple[float, ...]:
+        if self.start[n] != self.stop[n]:
+            return self.start[n], self.stop[n]
+        return self.start[n] - self.radius, self.start[n] + self.radius
+
+
+@dataclass(frozen=True)
+class CylindricalShell(Primitive):
+    start: point
+    stop: point
+    radius: float
+    shell_width: float
+    priority: int = 0
+    coordinates_system: Optional[CoordinatesSystem] = None
+
+    def to_xml(self) -> str:
+        xml = f'<CylindricalShell Priority="{self.priority}"{_coords_xml(self.coordinates_system)} Radius="{self.radius:e}" ShellWidth="{self.shell_width:e}">\n'
+        xml += f'    <P1 X="{self.start[0]:8e}" Y="{self.start[1]:8e}" Z="{self.start[2]:8e}" />\n'
+        xml += f'    <P2 X="{self.stop[0]:8e}" Y="{self.stop[1]:8e}" Z="{self.stop[2]:8e}" />\n'
+        xml += "</CylindricalShell>"
+        return xml
+
+    def transform(self, transform: Transform) -> "CylindricalShell":
+        return replace(
+            self, start=transform.apply(self.start), stop=transform.apply(self.stop)
+        )
+
+    def edges(self, n: int) -> tuple[float, ...]:
+        if self.start[n] != self.stop[n]:
+            return self.start[n], self.stop[n]
+        outer = self.radius + self.shell_width / 2
+        return self.start[n] - outer, self.start[n] + outer
+
+
+@dataclass(frozen=True)
+class Cell:
+    """
+    Reusable sub-structure, holding primitives by property name, in local
+    Cartesian coordinates.
+    """
+
+    primitives: dict[str, list[Primitive]] = field(default_factory=dict)
+
+    def add_primitive(self, property_name: str, primitive: Primitive):
+        self.primitives.setdefault(property_name, []).append(primitive)
+
+    def add_box(self, property_name: str, start: point, stop: point, priority: int = 0):
+        self.add_primitive(property_name, Box(start, stop, priority))
+
+    def edges(self, n: int) -> set[float]:
+        """
+        Positions of the primitive edges along the `n`-th axe, in local coordinates.
+        """
+        return {
+            edge
+            for primitives in self.primitives.values()
+            for primitive in primitives
+            for edge in primitive.edges(n)
+        }
+
 
 PropertyKind = Literal[
     "Metal", "Material", "LumpedElement", "Excitation", "ProbeBox", "DumpBox"
@@ -175,8 +408,26 @@ class Property:
         )
     )
     _primitive: list[Primitive] = field(default_factory=list)
+    _instances: list[tuple[Cell, Sequence[Transform]]] = field(default_factory=list)
+
+    def iter_primitives(self) -> Iterator[Primitive]:
+        """
+        Iterate over the primitives of the property, expanding the cell instances.
+        """
+        yield from self._primitive
+        for cell, transforms in self._instances:
+            for transform in transforms:
+                for primitive in cell.primitives[self.name]:
+                    yield primitive.transform(transform)
 
     def to_xml(self) -> str:
+        return "".join(self.iter_xml())
+
+    def iter_xml(self) -> Iterator[str]:
+        """
+        Generate the XML of the property line by line, so that the cell instances
+        are expanded only while the XML is written.
+        """
         match self.kind:
             case "Material":
                 iso = ' Isotropy="1"'
@@ -184,26 +435,27 @@ class Property:
                 iso = self.material.to_xml()
             case _:
                 iso = ""
-        xml = f'<{self.kind} ID="{self.id}" Name="{self.name}"{iso}>\n'
-        xml += f"    <FillColor {self.fillcolor.to_xml()} />\n"
-        xml += f"    <EdgeColor {self.edgecolor.to_xml()} />\n"
-        xml += "    <Primitives>\n"
-        for primitive in self._primitive:
+        yield f'<{self.kind} ID="{self.id}" Name="{self.name}"{iso}>\n'
+        yield f"    <FillColor {self.fillcolor.to_xml()} />\n"
+        yield f"    <EdgeColor {self.edgecolor.to_xml()} />\n"
+        yield "    <Primitives>\n"
+        for primitive in self.iter_primitives():
             for line in primitive.to_xml().splitlines():
-                xml += f"        {line}\n"
-        xml += "    </Primitives>\n"
+                yield f"        {line}\n"
+        yield "    </Primitives>\n"
         if self.kind == "Material":
-            xml += f"    {self.material.to_xml(False)}\n"
-            xml += f"    {self.weight.to_xml(False)}\n"
+            yield f"    {self.material.to_xml(False)}\n"
+            yield f"    {self.weight.to_xml(False)}\n"
+        if isinstance(self.material, DumpBoxProperty) and self.material.frequency:
+            yield f"    <FD_Samples>{','.join([f'{f:e}' for f in self.material.frequency])}</FD_Samples>\n"
         if self.kind == "Excitation":
-            xml += '    <Weight X="1.000000e+00" Y="1.000000e+00" Z="1.000000e+00" />\n'
-        xml += f"</{self.kind}>\n"
-        return xml
+            yield '    <Weight X="1.000000e+00" Y="1.000000e+00" Z="1.000000e+00" />\n'
+        yield f"</{self.kind}>\n"
 
 
 @dataclass(frozen=True)
 class ContinousStructure:
-    coordinates_system: int = 0
+    coordinates_system: CoordinatesSystem = 0
     lines: dict[Axes, Line] = field(default_factory=dict)
     background_material: MaterialProperty = field(
         default_factory=lambda: MaterialProperty(
@@ -216,8 +468,19 @@ class ContinousStructure:
         for axe in get_args(Axes):
             self.lines[axe] = Line(axe.upper())
 
-    def add_line(self, axe: Axes, position: float):
-        self.lines[axe].position.append(position)
+    def add_line(self, axe: Axes | CylindricalAxes, position: float):
+        """
+        Add a mesh line. In cylindrical coordinates, the lines are given along the
+        "R", "A" (alpha, in radian) and "Z" axes.
+        """
+        self.lines[self._grid_axe(axe)].position.append(position)
+
+    def _grid_axe(self, axe: Axes | CylindricalAxes) -> Axes:
+        if axe == "R" or axe == "A":
+            if self.coordinates_system != 1:
+                raise ValueError(f"Axe {axe} requires cylindrical coordinates.")
+            return CYLINDRICAL_AXES[axe]
+        return axe
 
     def add_property(
         self,
@@ -226,10 +489,23 @@ class ContinousStructure:
         fillcolor: Color = Color(255, 255, 255, 255),
         edgecolor: Optional[Color] = None,
         prop_conf: Optional[dict[str, float | int]] = None,
+        subsampling: Optional[tuple[int, int, int]] = None,
+        optresolution: Optional[tuple[float, float, float]] = None,
+        frequency: Sequence[float] = (),
     ):
+        """
+        Add a property to the structure.
+
+        `subsampling`, `optresolution` and `frequency` are the decimation and
+        frequency-domain options of the DumpBox properties.
+        """
         id = len(self.properties)
         if prop_conf is None:
             prop_conf = {}
+        if kind != "DumpBox" and (
+            subsampling is not None or optresolution is not None or frequency
+        ):
+            raise ValueError(f"Dump options are not available for {kind} properties.")
         match kind:
             case "Material" | "Metal":
                 property = MaterialProperty(
@@ -261,6 +537,22 @@ class ContinousStructure:
                     dumptype=int(
                         prop_conf["dumptype"] if "dumptype" in prop_conf else 0
                     ),
+                    dumpmode=int(
+                        prop_conf["dumpmode"] if "dumpmode" in prop_conf else 1
+                    ),
+                    filetype=int(
+                        prop_conf["filetype"] if "filetype" in prop_conf else 1
+                    ),
+                    multigridlevel=int(
+                        prop_conf["multigridlevel"]
+                        if "multigridlevel" in prop_conf
+                        else 0
+                    ),
+                    starttime=prop_conf["starttime"] if "starttime" in prop_conf else 0,
+                    stoptime=prop_conf["stoptime"] if "stoptime" in prop_conf else 0,
+                    subsampling=subsampling,
+                    optresolution=optresolution,
+                    frequency=tuple(frequency),
                 )
             case _:
                 raise ValueError(f"Unknown property kind: {kind}")
@@ -277,21 +569,135 @@ class ContinousStructure:
     def add_box(
         self, start: point, stop: point, priority: int = 0, property_id: int = 0
     ):
-        box = Box(start, stop, priority)
+        box = Box(start, stop, priority, self._primitive_coordinates())
         self.properties[property_id]._primitive.append(box)
 
+    def add_cylinder(
+        self,
+        start: point,
+        stop: point,
+        radius: float,
+        priority: int = 0,
+        property_id: int = 0,
+    ):
+        """
+        Add a cylinder going from `start` to `stop`. In cylindrical coordinates,
+        `start` and `stop` are given as (r, alpha, z) points.
+        """
+        cylinder = Cylinder(
+            start, stop, radius, priority, self._primitive_coordinates()
+        )
+        self.properties[property_id]._primitive.append(cylinder)
+
+    def add_cylindrical_shell(
+        self,
+        start: point,
+        stop: point,
+        radius: float,
+        shell_width: float,
+        priority: int = 0,
+        property_id: int = 0,
+    ):
+        """
+        Add a cylindrical shell going from `start` to `stop`. In cylindrical
+        coordinates, `start` and `stop` are given as (r, alpha, z) points.
+        """
+        shell = CylindricalShell(
+            start, stop, radius, shell_width, priority, self._primitive_coordinates()
+        )
+        self.properties[property_id]._primitive.append(shell)
+
+    def add_instances(
+        self, cell: Cell, transforms: Sequence[Transform], mesh: bool = False
+    ):
+        """
+        Place a cell several times. The instances are expanded only when the XML is
+        generated. Cells are only available in Cartesian structures.
+
+        Args:
+            cell: the cell to place, whose primitives are given by property name.
+            transforms: placement of each instance.
+            mesh: if True, add mesh lines on the edges of all the instances. The
+                existing mesh lines are kept as is, only the missing edges are added.
+        """
+        if self.coordinates_system != 0:
+            raise ValueError("Cells are only available in Cartesian coordinates.")
+        transforms = tuple(transforms)
+        properties = {prop.name: prop for prop in self.properties}
+        for name in cell.primitives:
+            if name not in properties:
+                raise ValueError(f"Unknown property: {name}")
+            properties[name]._instances.append((cell, transforms))
+        if not mesh:
+            return
+        for n, axe in enumerate(get_args(Axes)):
+            local = cell.edges(n)
+            edges = {t.apply_coord(e, n) for t in transforms for e in local}
+            edges.difference_update(self.lines[axe].position)
+            self.lines[axe].position.extend(sorted(edges))
+
+    def _primitive_coordinates(self) -> Optional[CoordinatesSystem]:
+        # Primitives of cylindrical structures are given as (r, alpha, z) points.
+        return self.coordinates_system if self.coordinates_system != 0 else None
+
+    def refine_mesh(self, factors: int | dict[Axes | CylindricalAxes, int]):
+        """
+        Scale the density of the mesh lines along each axe.
+
+        Args:
+            factors: density scaling, common to all axes or given by axe. In
+                cylindrical coordinates, the "R" and "A" axes can be used.
+        """
+        if isinstance(factors, dict):
+            by_axe = {self._grid_axe(axe): factor for axe, factor in factors.items()}
+        else:
+            by_axe = {axe: factors for axe in get_args(Axes)}
+        for axe in get_args(Axes):
+            self.lines[axe] = self.lines[axe].refine(by_axe.get(axe, 1))
+
+    def dump_size(self, property_id: int, nb_dumps: int = 1) -> tuple[int, int]:
+        """
+        Predict the size of the files written by a DumpBox property.
+
+        Args:
+            property_id: id of the DumpBox property.
+            nb_dumps: number of time-domain dumps expected during the simulation.
+        Returns:
+            tuple[int, int]: bytes written per dump and in total, summed over all the boxes of the property.
+        """
+        prop = self.properties[property_id]
+        if not isinstance(prop.material, DumpBoxProperty):
+            raise ValueError(f"Property {prop.name} is not a DumpBox.")
+        per_dump, total = 0, 0
+        for primitive in prop.iter_primitives():
+            if not isinstance(primitive, Box):
+                raise ValueError(
+                    f"Dump size can only be predicted for boxes, not {type(primitive).__name__}."
+                )
+            size = prop.material.dump_size(
+                self.lines, primitive.start, primitive.stop, nb_dumps
+            )
+            per_dump += size[0]
+            total += size[1]
+        return per_dump, total
+
     def to_xml(self) -> str:
-        xml = f'<ContinuousStructure CoordSystem="{self.coordinates_system}">\n'
-        xml += '    <RectilinearGrid DeltaUnit="0.001" CoordSystem="0">\n'
+        return "".join(self.iter_xml())
+
+    def iter_xml(self) -> Iterator[str]:
+        """
+        Generate the XML of the structure line by line.
+        """
+        yield f'<ContinuousStructure CoordSystem="{self.coordinates_system}">\n'
+        yield f'    <RectilinearGrid DeltaUnit="0.001" CoordSystem="{self.coordinates_system}">\n'
         for line in self.lines.values():
-            xml += f"        {line.to_xml()}\n"
-        xml += "    </RectilinearGrid>\n"
-        xml += f"    {self.background_material.to_xml()}\n"
-        xml += "    <ParameterSet />\n"
-        xml += "    <Properties>\n"
+            yield f"        {line.to_xml()}\n"
+        yield "    </RectilinearGrid>\n"
+        yield f"    {self.background_material.to_xml()}\n"
+        yield "    <ParameterSet />\n"
+        yield "    <Properties>\n"
         for property in self.properties:
-            for line in property.to_xml().splitlines():
-                xml += f"        {line}\n"
-        xml += "    </Properties>\n"
-        xml += "</ContinuousStructure>\n"
-        return xml
+            for line in property.iter_xml():
+                yield f"        {line}"
+        yield "    </Properties>\n"
+        yield "</ContinuousStructure>\n"
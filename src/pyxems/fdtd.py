@@ -26,9 +26,20 @@ class FDTDConfig:
     max_time_step: int = 1_000_000
     boundary_cond: BoundaryCond = field(default_factory=BoundaryCond)
     exitation: int = 0
+    cylinder_coords: bool = False
+    multigrid: tuple[float, ...] = ()
+
+    def __post_init__(self):
+        if self.multigrid and not self.cylinder_coords:
+            raise ValueError("MultiGrid is only available with cylinder coordinates.")
 
     def to_xml(self) -> str:
-        xml = f'<FDTD MaxTimeStep="{self.max_time_step}">\n'
+        xml = f'<FDTD MaxTimeStep="{self.max_time_step}"'
+        if self.cylinder_coords:
+            xml += ' CylinderCoords="1"'
+            if self.multigrid:
+                xml += f' MultiGrid="{",".join([f"{r:g}" for r in self.multigrid])}"'
+        xml += ">\n"
         xml += f"    {self.boundary_cond.to_xml()}\n"
         xml += f"    <Excitation Type={self.exitation} />\n"
         xml += "</FDTD>\n"
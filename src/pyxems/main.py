@@ -1,5 +1,6 @@
 from pathlib import Path
 from dataclasses import dataclass, field
+from typing import Iterator
 
 from pyxems.fdtd import FDTDConfig
 from pyxems.csx import ContinousStructure
@@ -10,15 +11,27 @@ class PyXEMSConfig:
     fdtd: FDTDConfig = field(default_factory=FDTDConfig)
     csx: ContinousStructure = field(default_factory=ContinousStructure)
 
+    def __post_init__(self):
+        if self.fdtd.cylinder_coords != (self.csx.coordinates_system == 1):
+            raise ValueError(
+                "The FDTD engine and the structure must share the same coordinates system."
+            )
+
     def to_xml(self) -> str:
-        xml = "<openEMS>\n"
-        xml += self.fdtd.to_xml()
-        xml += self.csx.to_xml()
-        xml += "</openEMS>\n"
-        return xml
+        return "".join(self.iter_xml())
+
+    def iter_xml(self) -> Iterator[str]:
+        """
+        Generate the XML configuration by chunks, to write it without building the
+        whole string in memory.
+        """
+        yield "<openEMS>\n"
+        yield self.fdtd.to_xml()
+        yield from self.csx.iter_xml()
+        yield "</openEMS>\n"
 
 
 def write_openEMS_xml(filename: Path | str, config: PyXEMSConfig):
     with open(filename, "w") as f:
         f.write('<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n')
-        f.write(config.to_xml())
+        f.writelines(config.iter_xml())
@@ -0,0 +1,122 @@
+from pathlib import Path
+from hashlib import sha256
+from subprocess import CompletedProcess
+from pyxems import convergence
+from pyxems.convergence import (
+    mesh_convergence,
+    probe_difference,
+    read_probe,
+    run_level,
+)
+from pyxems.main import PyXEMSConfig, write_openEMS_xml
+from pyxems.csx import Color, Line
+import logging
+import os
+import pytest
+
+
+def test_probe_difference(tmp_path: Path):
+    probe = tmp_path / "port_ut_1"
+    probe.write_text("% time-domain voltage integral by openEMS\n% t/s\tvoltage\n")
+    with open(probe, "a") as f:
+        for n in range(11):
+            f.write(f"{n * 1e-10}\t{n}\n")
+    reference = {"port_ut_1": read_probe(probe)}
+    assert reference["port_ut_1"][1][-1] == 10
+    assert probe_difference(reference, reference) == 0
+    coarse = {"port_ut_1": ([0.0, 1e-9], [0.0, 11.0])}
+    assert 0.09 < probe_difference(reference, coarse) < 0.11
+    with pytest.raises(ValueError):
+        probe_difference({}, {})
+
+
+def test_run_level_reuse(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    config = PyXEMSConfig()
+    config.csx.add_line("X", 0)
+    config.csx.add_line("X", 1)
+    config.csx.refine_mesh({"X": 4})
+    assert config.csx.lines["X"].position == [0, 0.25, 0.5, 0.75, 1]
+    assert Line("X", [0, 0, 1]).refine(2).position == [0, 0.5, 1]
+    with pytest.raises(ValueError):
+        config.csx.refine_mesh(1.5)  # type: ignore
+    config.csx.add_property("ProbeBox", "port_ut_1", Color(235, 179, 166))
+    run_dir = tmp_path / sha256(config.to_xml().encode()).hexdigest()[:16]
+    run_dir.mkdir()
+    write_openEMS_xml(run_dir / "openEMS_config.xml", config)
+    (run_dir / "port_ut_1").write_text("0\t0\n1e-10\t1\n")
+    calls = []
+    monkeypatch.setattr(
+        convergence,
+        "simulate",
+        lambda config_path, run_dir: calls.append(run_dir) or CompletedProcess([], 0),
+    )
+    # an interrupted run is done again
+    run_level(config, tmp_path)
+    assert calls == [run_dir.resolve()]
+    # a completed run is found from its configuration, openEMS is not called
+    reused_dir, probes = run_level(config, tmp_path)
+    assert calls == [run_dir.resolve()]
+    assert reused_dir == run_dir.resolve()
+    assert probes == {"port_ut_1": ([0, 1e-10], [0, 1])}
+
+
+def test_mesh_convergence(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+):
+    def factory() -> PyXEMSConfig:
+        config = PyXEMSConfig()
+        for axe in ("X", "Y", "Z"):
+            config.csx.add_line(axe, 0)
+            config.csx.add_line(axe, 1)
+        config.csx.add_property("ProbeBox", "port_ut_1", Color(235, 179, 166))
+        return config
+
+    # the probe converges towards 1 as the mesh is refined
+    nb_lines = []
+
+    def fake_run_level(config: PyXEMSConfig, root: Path):
+        nb_lines.append(len(config.csx.lines["X"].position))
+        value = 1.0 - 1.0 / len(config.csx.lines["X"].position) ** 2
+        return root / str(nb_lines[-1]), {"port_ut_1": ([0.0, 1.0], [value, value])}
+
+    monkeypatch.setattr(convergence, "run_level", fake_run_level)
+    results = mesh_convergence(factory, tmp_path, 0.1, levels=(1, 2, 4, 8))
+    assert nb_lines == [2, 3, 5]
+    assert [level.factors for level in results] == [1, 2, 4]
+    assert results[0].error is None
+    assert results[1].error is not None and results[1].error > 0.1
+    assert results[2].error is not None and results[2].error < 0.1
+    # all the levels are run when the tolerance is never met
+    nb_lines.clear()
+    with caplog.at_level(logging.WARNING):
+        results = mesh_convergence(factory, tmp_path, 0.01, levels=(1, 2, 4, 8))
+    assert nb_lines == [2, 3, 5, 9]
+    assert "Mesh convergence not reached" in caplog.text
+
+
+def test_mesh_convergence_reuse(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    def factory() -> PyXEMSConfig:
+        config = PyXEMSConfig()
+        config.csx.add_line("X", 0)
+        config.csx.add_line("X", 1)
+        config.csx.add_property("ProbeBox", "port_ut_1", Color(235, 179, 166))
+        return config
+
+    calls = []
+
+    def fake_simulate(config_path: Path, run_dir: Path) -> CompletedProcess:
+        # like openEMS runs, change the working directory to the run folder
+        os.chdir(run_dir)
+        calls.append(run_dir)
+        Path("port_ut_1").write_text(f"0\t0\n1\t{len(calls)}\n")
+        return CompletedProcess([], 0)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(convergence, "simulate", fake_simulate)
+    first = mesh_convergence(factory, Path("runs"), 0.0, levels=(1, 2))
+    assert Path.cwd() == tmp_path
+    assert [level.run_dir.parent for level in first] == [tmp_path / "runs"] * 2
+    # the completed runs are reused by a new study
+    second = mesh_convergence(factory, Path("runs"), 0.0, levels=(1, 2))
+    assert len(calls) == 2
+    assert [level.run_dir for level in second] == [level.run_dir for level in first]
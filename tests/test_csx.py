@@ -0,0 +1,117 @@
+import pytest
+
+from pyxems.csx import Box, Cell, ContinousStructure, Color, Transform
+
+
+def test_dump_box_decimation():
+    csx = ContinousStructure()
+    for i in range(11):
+        csx.add_line("X", float(i))
+        csx.add_line("Y", float(i))
+        csx.add_line("Z", float(i))
+    csx.add_property(
+        "DumpBox",
+        "E_td",
+        Color(12, 62, 153),
+        subsampling=(2, 2, 1),
+    )
+    csx.add_box((0, 0, 0), (10, 10, 0), property_id=0)
+    csx.add_property(
+        "DumpBox",
+        "E_fd",
+        Color(12, 62, 153),
+        prop_conf={"dumptype": 10},
+        optresolution=(5, 5, 5),
+        frequency=(1e9, 2e9),
+    )
+    csx.add_box((0, 0, 0), (10, 10, 10), property_id=1)
+    xml = csx.to_xml()
+    assert 'SubSampling="2,2,1"' in xml
+    assert 'OptResolution="5,5,5"' in xml
+    assert "<FD_Samples>1.000000e+09,2.000000e+09</FD_Samples>" in xml
+    # 6 x 6 x 1 points, 3 components in single precision
+    assert csx.dump_size(0, nb_dumps=10) == (6 * 6 * 12, 6 * 6 * 12 * 10)
+    # 3 x 3 x 3 points, complex values for 2 frequencies
+    assert csx.dump_size(1) == (27 * 24, 27 * 24 * 2)
+    # SAR dumps are scalar, written once per frequency
+    csx.add_property("DumpBox", "SAR", prop_conf={"dumptype": 20}, frequency=(1e9, 2e9))
+    csx.add_box((0, 0, 0), (10, 10, 10), property_id=2)
+    assert csx.dump_size(2) == (11**3 * 4, 11**3 * 4 * 2)
+    # cell interpolation drops one point per axe
+    csx.add_property("DumpBox", "E_cell", prop_conf={"dumpmode": 2})
+    csx.add_box((0, 0, 0), (10, 10, 10), property_id=3)
+    assert csx.dump_size(3) == (10**3 * 12, 10**3 * 12)
+    csx.add_property("DumpBox", "E_vtk", prop_conf={"filetype": 0})
+    csx.add_box((0, 0, 0), (10, 10, 10), property_id=4)
+    with pytest.raises(ValueError):
+        csx.dump_size(4)
+    csx.add_cylinder((0, 0, 0), (0, 0, 10), 2, property_id=3)
+    with pytest.raises(ValueError):
+        csx.dump_size(3)
+    with pytest.raises(ValueError):
+        csx.add_property("DumpBox", "H_fd", prop_conf={"dumptype": 11})
+    with pytest.raises(ValueError):
+        csx.add_property("DumpBox", "SAR_no_freq", prop_conf={"dumptype": 20})
+    with pytest.raises(ValueError):
+        csx.add_property("ProbeBox", "ut", frequency=(1e9,))
+
+
+def test_cylindrical_coax():
+    csx = ContinousStructure(coordinates_system=1)
+    for r in (0.5, 1.0, 1.5, 2.0):
+        csx.add_line("R", r)
+    for a in (-3.14159, 0, 3.14159):
+        csx.add_line("A", a)
+    for z in (0, 10):
+        csx.add_line("Z", z)
+    csx.add_property("Metal", "inner", Color(200, 200, 200))
+    csx.add_box((0, -3.14159, 0), (0.5, 3.14159, 10), priority=10, property_id=0)
+    csx.add_property("Metal", "outer", Color(200, 200, 200))
+    csx.add_cylindrical_shell((0, 0, 0), (0, 0, 10), 2, 0.1, property_id=1)
+    xml = csx.to_xml()
+    assert '<RectilinearGrid DeltaUnit="0.001" CoordSystem="1">' in xml
+    assert '<XLines Qty="4">0.5,1.0,1.5,2.0</XLines>' in xml
+    assert '<Box Priority="10" CoordSystem="1">' in xml
+    assert 'Radius="2.000000e+00" ShellWidth="1.000000e-01"' in xml
+    csx.refine_mesh({"R": 2, "A": 1})
+    assert csx.lines["X"].position == [0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0]
+    assert csx.lines["Y"].position == [-3.14159, 0, 3.14159]
+    with pytest.raises(ValueError):
+        ContinousStructure().add_line("R", 0.5)
+
+
+def test_cell_instances():
+    csx = ContinousStructure()
+    csx.add_property("Metal", "patch", Color(41, 35, 190))
+    csx.add_property(
+        "Material", "substrate", Color(132, 225, 108), prop_conf={"eps": 3.38}
+    )
+    cell = Cell()
+    cell.add_box("patch", (1, 1, 1), (4, 4, 1), priority=10)
+    cell.add_box("substrate", (0, 0, 0), (5, 5, 1))
+    transforms = [
+        Transform((5.0 * (i + i % 2), 5.0 * j, 0.0), (i % 2 == 1, False, False))
+        for i in range(10)
+        for j in range(10)
+    ]
+    csx.add_instances(cell, transforms, mesh=True)
+    # the instances are kept symbolic until the xml generation
+    assert csx.properties[0]._primitive == []
+    patches = list(csx.properties[0].iter_primitives())
+    assert len(patches) == 100
+    # odd columns are mirrored, then shifted to tile the array
+    assert patches[10] == Box((9, 1, 1), (6, 4, 1), 10)
+    assert csx.to_xml().count("<Box ") == 200
+    cells = [5.0 * k + edge for k in range(10) for edge in (0, 1, 4)]
+    assert csx.lines["X"].position == cells + [50]
+    assert csx.lines["Y"].position == cells + [50]
+    assert csx.lines["Z"].position == [0, 1]
+    # existing lines are kept, only the missing edges are added
+    csx.add_line("Z", 2)
+    csx.add_line("Z", 0.5)
+    csx.add_instances(cell, [Transform((0.0, 0.0, 1.0))], mesh=True)
+    assert csx.lines["Z"].position == [0, 1, 2, 0.5]
+    with pytest.raises(ValueError):
+        csx.add_instances(Cell({"gnd": []}), transforms)
+    with pytest.raises(ValueError):
+        ContinousStructure(coordinates_system=1).add_instances(cell, transforms)
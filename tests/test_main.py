@@ -1,7 +1,9 @@
 from pathlib import Path
 from pyxems.main import PyXEMSConfig, write_openEMS_xml
-from pyxems.csx import Color
+from pyxems.csx import Color, ContinousStructure
+from pyxems.fdtd import FDTDConfig
 import logging
+import pytest
 
 
 def test_generate_simp_patch(tmp_path: Path):
@@ -285,3 +287,17 @@ def test_generate_simp_patch(tmp_path: Path):
     )
     write_openEMS_xml(tmp_path / "openEMS_config.xml", oems_config)
     assert (tmp_path / "openEMS_config.xml").read_text() == ref.read_text()
+
+
+def test_cylindrical_config():
+    oems_config = PyXEMSConfig(
+        FDTDConfig(cylinder_coords=True, multigrid=(10, 20)),
+        ContinousStructure(coordinates_system=1),
+    )
+    assert '<FDTD MaxTimeStep="1000000" CylinderCoords="1" MultiGrid="10,20">' in (
+        oems_config.to_xml()
+    )
+    with pytest.raises(ValueError):
+        PyXEMSConfig(FDTDConfig(cylinder_coords=True))
+    with pytest.raises(ValueError):
+        FDTDConfig(multigrid=(1, 2))